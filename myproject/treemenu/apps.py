@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TreemenuConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "treemenu"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401  Connects cache invalidation receivers
@@ -0,0 +1,45 @@
+import hashlib
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Bumped whenever any MenuItem changes; embedded in every fragment key so a
+# single write invalidates all cached menus without needing pattern deletes.
+MENU_CACHE_VERSION_KEY = "treemenu:version"
+
+# Default seconds a rendered fragment may be served. With a per-process backend
+# (the default LocMemCache) a save only bumps the version in the worker that
+# handled it, so this bounds how long other workers can show the previous menu.
+DEFAULT_MENU_CACHE_TIMEOUT = 60
+
+
+def get_menu_cache_timeout() -> Optional[int]:
+    """
+    Returns settings.TREEMENU_CACHE_TIMEOUT, or the default if unset. Shared
+    backends (Redis, Memcached) can raise it or use None (never expire), since
+    the version bump already reaches every process.
+    """
+    return getattr(settings, "TREEMENU_CACHE_TIMEOUT", DEFAULT_MENU_CACHE_TIMEOUT)
+
+
+def _get_menu_cache_version() -> int:
+    """Returns the current menu fragment version, initializing it if missing."""
+    return cache.get_or_set(MENU_CACHE_VERSION_KEY, 1, timeout=None)
+
+
+def get_menu_cache_key(menu_name: str, path: str) -> str:
+    """
+    Builds the cache key for a rendered menu fragment.
+    The menu name and path are hashed to keep keys short and backend-safe.
+    """
+    digest = hashlib.md5(f"{menu_name}\n{path}".encode()).hexdigest()
+    return f"treemenu:{_get_menu_cache_version()}:{digest}"
+
+
+def invalidate_menu_cache() -> None:
+    """Expires every cached menu fragment by bumping the version counter."""
+    try:
+        cache.incr(MENU_CACHE_VERSION_KEY)
+    except ValueError:  # Key missing (never set or evicted)
+        cache.set(MENU_CACHE_VERSION_KEY, 2, timeout=None)
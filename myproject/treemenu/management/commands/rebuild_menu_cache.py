@@ -0,0 +1,20 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from treemenu.tree import rebuild_all_menu_caches
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the stored MenuCache trees from MenuItem rows. Run after edits "
+        "that bypass model signals, e.g. QuerySet.update(), raw SQL or migrations."
+    )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        menu_names = rebuild_all_menu_caches()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(menu_names)} menu(s): {', '.join(menu_names)}"
+            )
+        )
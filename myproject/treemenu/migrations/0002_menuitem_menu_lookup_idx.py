@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treemenu', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='menuitem',
+            name='menu_name',
+            field=models.CharField(help_text="Identifier for the menu (e.g., 'main_menu', 'sidebar_menu').", max_length=50, verbose_name='Menu Name'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['menu_name', 'parent', 'order', 'name'], name='treemenu_menu_lookup_idx'),
+        ),
+    ]
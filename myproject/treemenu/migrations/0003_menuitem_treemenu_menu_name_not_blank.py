@@ -0,0 +1,17 @@
+import django.db.models.functions.text
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treemenu', '0002_menuitem_menu_lookup_idx'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='menuitem',
+            constraint=models.CheckConstraint(condition=django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(django.db.models.functions.text.Replace(models.F('menu_name'), models.Value('\t'), models.Value(' ')), models.Value('\n'), models.Value(' ')), models.Value('\r'), models.Value(' ')), models.Value('\x0b'), models.Value(' ')), models.Value('\x0c'), models.Value(' ')))), 0), name='treemenu_menu_name_not_blank', violation_error_message='Menu Name is required and cannot be empty.'),
+        ),
+    ]
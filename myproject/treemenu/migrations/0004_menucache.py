@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('treemenu', '0003_menuitem_treemenu_menu_name_not_blank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuCache',
+            fields=[
+                ('menu_name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Menu Name')),
+                ('tree', models.JSONField(verbose_name='Tree')),
+            ],
+            options={
+                'verbose_name': 'Menu Cache',
+                'verbose_name_plural': 'Menu Caches',
+            },
+        ),
+    ]
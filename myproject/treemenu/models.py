@@ -1,13 +1,123 @@
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.urls import NoReverseMatch, reverse
+from django.core.signals import setting_changed
+from django.db import connection, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Length, Replace, Trim
+from django.db.models.lookups import GreaterThan
+from django.dispatch import receiver
+from django.urls import (
+    NoReverseMatch,
+    get_resolver,
+    get_script_prefix,
+    reverse,
+    set_script_prefix,
+)
 from django.utils.translation import gettext_lazy as _
+from contextlib import contextmanager
+from functools import lru_cache
 import logging
-from typing import Optional  # For type hinting
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+)  # For type hinting
 
 logger = logging.getLogger(__name__)
 
 
+# Pattern name -> path for every argument-less, non-namespaced URL pattern.
+# Built on first use (the URLconf may not be importable while apps load).
+# Paths are stored relative to the script prefix (see `_reverse_unprefixed`).
+_named_url_map: Optional[Dict[str, str]] = None
+
+
+@contextmanager
+def _root_script_prefix() -> Iterator[None]:
+    """
+    Temporarily sets the thread-local script prefix to "/" so reverse() yields
+    paths that can be cached process-wide, whatever prefix (SCRIPT_NAME /
+    FORCE_SCRIPT_NAME, or none outside a request) is currently active.
+    """
+    prefix = get_script_prefix()
+    set_script_prefix("/")
+    try:
+        yield
+    finally:
+        set_script_prefix(prefix)
+
+
+def _build_named_url_map() -> Dict[str, str]:
+    """Reverses every bare pattern name in the root URLconf that takes no arguments."""
+    named_urls: Dict[str, str] = {}
+    with _root_script_prefix():
+        for name in get_resolver().reverse_dict.keys():
+            if not isinstance(name, str):  # Keys also include view callables
+                continue
+            try:
+                named_urls[name] = reverse(name)
+            except NoReverseMatch:  # Pattern requires arguments
+                continue
+    return named_urls
+
+
+@lru_cache(maxsize=512)
+def _reverse_unprefixed(named_url: str) -> Optional[str]:
+    """
+    Memoized, prefix-free reverse() for names missing from the precomputed map
+    (e.g. 'app_name:view_name'). Returns None (and logs once per name)
+    if the pattern cannot be reversed.
+    """
+    try:
+        with _root_script_prefix():
+            return reverse(named_url)
+    except NoReverseMatch:
+        logger.warning(f"Named URL '{named_url}' failed to resolve. Falling back.")
+        return None
+
+
+def resolve_named_url(named_url: str) -> Optional[str]:
+    """
+    Resolves a named URL via a precomputed {name: path} map, falling back to
+    a memoized reverse() for namespaced names.
+    Shared by the menu tree builder and the admin so URL resolution costs a
+    dict lookup instead of a resolver walk per row.
+    The cached paths are prefix-free; the current script prefix is applied here.
+    """
+    global _named_url_map
+    if _named_url_map is None:
+        _named_url_map = _build_named_url_map()
+    path = _named_url_map.get(named_url)
+    if path is None:
+        path = _reverse_unprefixed(named_url)
+    if path is None:
+        return None
+    # get_script_prefix() always ends with "/", and the cached path starts with one
+    return get_script_prefix() + path[1:]
+
+
+@receiver(setting_changed)
+def _clear_resolved_urls(*, setting: str, **kwargs: Any) -> None:
+    """
+    Drops precomputed URLs when the URLconf is swapped (e.g. in tests).
+    The development autoreloader restarts the process, so no hook is needed there.
+    """
+    global _named_url_map
+    if setting == "ROOT_URLCONF":
+        _named_url_map = None
+        _reverse_unprefixed.cache_clear()
+
+
+def _whitespace_to_spaces(expression: Any) -> Any:
+    """Wraps 'expression' so tab, newline, CR, VT and FF each become a space."""
+    for char in "\t\n\r\x0b\x0c":
+        expression = Replace(expression, Value(char), Value(" "))
+    return expression
+
+
 class MenuItem(models.Model):
     """
     Represents an item in a hierarchical, named menu.
@@ -20,8 +130,7 @@ class MenuItem(models.Model):
     )
     menu_name = models.CharField(
         _("Menu Name"),
-        max_length=50,
-        db_index=True,  # Essential for efficient querying of specific menus
+        max_length=50,  # Indexed as the leading column of Meta.indexes
         help_text=_("Identifier for the menu (e.g., 'main_menu', 'sidebar_menu')."),
     )
     parent = models.ForeignKey(
@@ -63,12 +172,41 @@ class MenuItem(models.Model):
         # Default ordering ensures consistent behavior in queries and admin.
         # `parent__id` helps to group items, though the tree is built explicitly by the templatetag.
         ordering = ["menu_name", "parent__id", "order", "name"]
+        # Covers the templatetag's WHERE menu_name = ... ORDER BY parent_id, order, name
+        indexes = [
+            models.Index(
+                fields=["menu_name", "parent", "order", "name"],
+                name="treemenu_menu_lookup_idx",
+            ),
+        ]
+        # Ensure menu_name is not just ASCII whitespace, enforced by the DB itself
+        # so raw SQL and bulk inserts are covered too. SQL TRIM only strips spaces,
+        # so the other ASCII whitespace characters are turned into spaces first.
+        # Unicode whitespace (e.g. "\xa0") passes this check; clean() rejects it
+        # too, via str.strip(), and attaches the error to the menu_name field.
+        constraints = [
+            models.CheckConstraint(
+                condition=GreaterThan(
+                    Length(Trim(_whitespace_to_spaces(F("menu_name")))), 0
+                ),
+                name="treemenu_menu_name_not_blank",
+                violation_error_message=_("Menu Name is required and cannot be empty."),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db: str, field_names: List[str], values: List[Any]) -> "MenuItem":
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored menu_name so moving an item to another menu can
+        # also refresh the menu it left (see signals.refresh_menu_cache).
+        instance._loaded_menu_name = instance.__dict__.get("menu_name")
+        return instance
 
     def __str__(self) -> str:
         parent_status = (
             " (Root)"
             if not self.parent_id
-            else f" (Parent: {self.parent.name if self.parent else 'N/A'})"
+            else f" (Parent ID: {self.parent_id})"  # Avoids fetching the parent row
         )
         return f"'{self.name}' [{self.menu_name}]{parent_status}"
 
@@ -77,18 +215,26 @@ class MenuItem(models.Model):
         Determines the item's display URL, prioritizing named_url.
         Returns '#' as a fallback if no valid URL can be determined.
         """
-        if self.named_url:
-            try:
-                return reverse(self.named_url)
-            except NoReverseMatch:
-                logger.warning(
-                    f"MenuItem (ID: {self.pk}, Name: '{self.name}'): "
-                    f"Named URL '{self.named_url}' failed to resolve. Falling back."
-                )
-                # Fallback to explicit URL if named_url resolution fails
-                return self.url or "#"
-        # Use explicit URL if no named_url is provided
-        return self.url or "#"
+        # Fallback to explicit URL if named_url is blank or fails to resolve
+        resolved = resolve_named_url(self.named_url) if self.named_url else None
+        return resolved or self.url or "#"
+
+    def _get_ancestor_links(self) -> Dict[int, Optional[int]]:
+        """
+        Maps the PK of the assigned parent and each of its ancestors to that
+        item's parent_id, fetched with one recursive CTE regardless of tree depth.
+        """
+        table = connection.ops.quote_name(self._meta.db_table)
+        sql = (
+            "WITH RECURSIVE anc(id, parent_id) AS ("
+            f"SELECT id, parent_id FROM {table} WHERE id = %s "
+            f"UNION SELECT m.id, m.parent_id FROM {table} m "
+            "JOIN anc ON m.id = anc.parent_id"
+            ") SELECT id, parent_id FROM anc"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.parent_id])
+            return dict(cursor.fetchall())
 
     def clean(self) -> None:
         """
@@ -105,37 +251,31 @@ class MenuItem(models.Model):
                     {"parent": _("An item cannot be its own parent.")}
                 )
 
-            # Traverse up the ancestor chain to detect cycles
-            ancestor: Optional["MenuItem"] = self.parent
-            visited_pks = {
-                self.parent_id
-            }  # Track visited ancestors to detect pre-existing loops
-
-            while ancestor:
-                if (
-                    ancestor.pk == self.pk
-                ):  # Current item found in its own ancestor chain
-                    raise ValidationError(
-                        {
-                            "parent": _(
-                                "Circular dependency: Item cannot be an ancestor of itself."
-                            )
-                        }
-                    )
-                # Check for loops in potentially corrupted existing data by tracking visited parent PKs
-                if ancestor.parent_id and ancestor.parent_id in visited_pks:
-                    logger.error(
-                        f"MenuItem (ID: {self.pk}): Loop detected in parent chain via parent ID "
-                        f"{ancestor.parent_id} during validation. Data might be corrupted."
-                    )
-                    # Optionally, raise an error here if strict data integrity is paramount
-                    # raise ValidationError({'parent': _("Corrupted parent chain detected (loop).")})
-                    break  # Stop traversal to prevent infinite loop
-                if ancestor.parent_id:
-                    visited_pks.add(ancestor.parent_id)
-                ancestor = ancestor.parent
-
-        # Ensure menu_name is provided and not just whitespace.
+            # Collect the whole ancestor chain in a single round trip.
+            # UNION (rather than UNION ALL) drops already-seen rows, so the
+            # recursion also terminates on pre-existing loops in corrupted data.
+            ancestor_links = self._get_ancestor_links()
+            if self.pk is not None and self.pk in ancestor_links:
+                raise ValidationError(
+                    {
+                        "parent": _(
+                            "Circular dependency: Item cannot be an ancestor of itself."
+                        )
+                    }
+                )
+            # A healthy chain ends at a root item; if none of the ancestors is
+            # a root, the existing parent chain already loops on itself.
+            if ancestor_links and None not in ancestor_links.values():
+                logger.error(
+                    f"MenuItem (ID: {self.pk}): Loop detected in parent chain via parent ID "
+                    f"{self.parent_id} during validation. Data might be corrupted."
+                )
+                # Optionally, raise an error here if strict data integrity is paramount
+                # raise ValidationError({'parent': _("Corrupted parent chain detected (loop).")})
+
+        # Ensure menu_name is provided and not just whitespace. Stricter than the
+        # DB constraint (str.strip() also removes Unicode whitespace), and shows
+        # the error on the field itself in forms.
         if not self.menu_name or not self.menu_name.strip():
             raise ValidationError(
                 {"menu_name": _("Menu Name is required and cannot be empty.")}
@@ -143,8 +283,81 @@ class MenuItem(models.Model):
 
     def save(self, *args, **kwargs) -> None:
         """
-        Overrides the default save method to ensure full_clean() is called,
-        enforcing all model validations even for programmatic saves.
+        Overrides the default save method to run clean() for programmatic saves,
+        enforcing the cycle and menu_name checks. Field-level validation is left
+        to the DB and to ModelForms (e.g. the admin), which call full_clean() themselves.
         """
-        self.full_clean()  # Calls field validation, model clean(), and unique constraint checks
+        self.clean()
         super().save(*args, **kwargs)
+
+    @classmethod
+    def _find_cyclic_pks(cls, menu_names: Set[str]) -> Set[int]:
+        """
+        Returns the PKs of items in 'menu_names' that are their own ancestor,
+        detected with one recursive CTE over all those menus at once.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        placeholders = ", ".join(["%s"] * len(menu_names))
+        sql = (
+            "WITH RECURSIVE anc(start_id, id) AS ("
+            f"SELECT id, parent_id FROM {table} "
+            f"WHERE menu_name IN ({placeholders}) AND parent_id IS NOT NULL "
+            f"UNION SELECT anc.start_id, m.parent_id FROM {table} m "
+            "JOIN anc ON m.id = anc.id WHERE m.parent_id IS NOT NULL"
+            ") SELECT DISTINCT start_id FROM anc WHERE id = start_id"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, list(menu_names))
+            return {row[0] for row in cursor.fetchall()}
+
+    @classmethod
+    def bulk_import(cls, rows: Iterable[Dict[str, Any]]) -> List["MenuItem"]:
+        """
+        Creates many items at once from dicts of field values
+        (e.g. {"name": ..., "menu_name": ..., "parent_id": ...}).
+
+        Intentionally bypasses save(): rows are inserted with bulk_create in
+        batches, the DB constraints catch blank menu names and bad parents,
+        and parent cycles are checked afterwards with a single query for all
+        affected menus. Since no post_save signals fire, the stored trees and
+        cached HTML of those menus are refreshed once the import commits.
+        """
+        from .tree import schedule_menu_rebuild  # tree.py imports this module
+
+        items = [cls(**row) for row in rows]
+        if not items:
+            return items
+        menu_names = {item.menu_name for item in items}
+
+        with transaction.atomic():
+            cls.objects.bulk_create(items, batch_size=500)
+            cyclic_pks = cls._find_cyclic_pks(menu_names)
+            if cyclic_pks:  # Rolls back the whole import
+                raise ValidationError(
+                    {
+                        "parent": _(
+                            "Circular dependency: Item cannot be an ancestor of itself."
+                        )
+                    }
+                )
+            schedule_menu_rebuild(menu_names)
+
+        return items
+
+
+class MenuCache(models.Model):
+    """
+    Denormalized tree for one menu, rebuilt from MenuItem rows once per
+    transaction that saves or deletes items (see treemenu.tree.rebuild_menu_cache).
+    URLs are kept unresolved and resolved at render time.
+    """
+
+    menu_name = models.CharField(_("Menu Name"), max_length=50, primary_key=True)
+    tree = models.JSONField(_("Tree"))
+
+    class Meta:
+        verbose_name = _("Menu Cache")
+        verbose_name_plural = _("Menu Caches")
+
+    def __str__(self) -> str:
+        return self.menu_name
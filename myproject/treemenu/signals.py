@@ -0,0 +1,22 @@
+from typing import Any
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MenuItem
+from .tree import schedule_menu_rebuild
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def refresh_menu_cache(sender: type, instance: MenuItem, **kwargs: Any) -> None:
+    """
+    Queues the affected menu(s) for a stored-tree rebuild and HTML cache expiry
+    once the transaction commits. An item moved to another menu refreshes both
+    old and new menus.
+    Note: QuerySet.update() and raw SQL do not send these signals; run the
+    `rebuild_menu_cache` management command after such edits.
+    """
+    menu_names = {instance.menu_name, getattr(instance, "_loaded_menu_name", None)}
+    schedule_menu_rebuild(menu_names - {None})
+    instance._loaded_menu_name = instance.menu_name
@@ -1,5 +1,4 @@
 from typing import (
-    List,
     Dict,
     Tuple,
     Set,
@@ -7,159 +6,101 @@ from typing import (
     Any,
 )  # For comprehensive type hinting
 from django import template
-from django.db.models import QuerySet
+from django.core.cache import cache
 from django.http import HttpRequest
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 
-from ..models import MenuItem  # Relative import for the MenuItem model
+from ..cache import get_menu_cache_key, get_menu_cache_timeout
+from ..tree import get_menu_tree, resolve_menu_tree
 
 register = template.Library()  # Required for custom template tags
 
-# Type alias for clarity
-MenuItemProcessed = (
-    MenuItem  # Could be a dataclass/TypedDict if not augmenting model instance
-)
-ItemsByIdMap = Dict[int, MenuItemProcessed]
+MENU_TEMPLATE = "treemenu/menu_template.html"
 
 
-def _get_menu_items_from_db(menu_name: str) -> QuerySet[MenuItem]:
-    """Fetches and orders all items for a specific menu from DB."""
-    # Ordering by parent_id, order, name is crucial for efficient tree construction
-    # and predictable display order within levels.
-    return MenuItem.objects.filter(menu_name=menu_name).order_by(
-        "parent_id", "order", "name"
-    )
-
-
-def _process_menu_items(
-    menu_items_qs: QuerySet[MenuItem], current_path: str
-) -> Tuple[List[MenuItemProcessed], Optional[MenuItemProcessed], ItemsByIdMap]:
+def _determine_expanded_pks(
+    active_pk: Optional[int], parent_ids: Dict[int, Optional[int]]
+) -> Set[int]:
     """
-    Prepares raw menu items: resolves URLs, finds active item, and indexes by ID.
-    Augments model instances with 'resolved_url' and 'children_nodes' attributes.
-    The database query is executed upon iterating `menu_items_qs`.
+    Identifies PKs of items that should be expanded in the menu.
+    Includes the active item and all its direct ancestors.
     """
-    all_items_processed: List[MenuItemProcessed] = []
-    active_item: Optional[MenuItemProcessed] = None
-    items_by_id: ItemsByIdMap = {}
-
-    for item in menu_items_qs:  # item is of type MenuItem
-        # Resolve URL, prioritizing named_url. Fallback to explicit_url, then to '#'.
-        # This logic could also live on the MenuItem model (e.g., item.get_display_url()).
-        # Here, we add it dynamically to avoid modifying the model instance permanently if not desired,
-        # or if the model's get_resolved_url has slightly different semantics for this context.
-        item.resolved_url = (
-            item.get_resolved_url()
-        )  # Assuming model has get_resolved_url method
+    if active_pk is None:
+        return set()
 
-        # Identify active item by comparing its resolved URL with the current request path.
-        if item.resolved_url == current_path:
-            active_item = item
+    expanded_pks: Set[int] = {active_pk}  # Active item's children are visible
 
-        item.children_nodes = []  # Initialize for storing child items
-        items_by_id[item.id] = item
-        all_items_processed.append(item)
+    # Walk up the parent chain by ID only, expanding every ancestor in this menu.
+    # Stopping at already-expanded IDs guards against loops in corrupted data.
+    pid: Optional[int] = parent_ids.get(active_pk)
+    while pid and pid in parent_ids and pid not in expanded_pks:
+        expanded_pks.add(pid)
+        pid = parent_ids[pid]
 
-    return all_items_processed, active_item, items_by_id
+    return expanded_pks
 
 
-def _build_menu_tree(
-    all_items_processed: List[MenuItemProcessed], items_by_id: ItemsByIdMap
-) -> List[MenuItemProcessed]:
-    """
-    Constructs the hierarchical tree structure from the flat list of processed items.
-    Populates 'children_nodes' for each parent.
-    """
-    root_items: List[MenuItemProcessed] = []
-    for item in all_items_processed:
-        if item.parent_id and item.parent_id in items_by_id:
-            parent = items_by_id[item.parent_id]
-            parent.children_nodes.append(
-                item
-            )  # Children are pre-sorted by the initial DB query
-        elif not item.parent_id:  # Item without a parent is a root item
-            root_items.append(item)
-    return root_items
+# --- Main Template Tag ---
 
 
-def _determine_expanded_pks(
-    active_item: Optional[MenuItemProcessed], items_by_id: ItemsByIdMap
-) -> Set[int]:
+def _build_menu_context(menu_name: str, current_path: str) -> Dict[str, Any]:
     """
-    Identifies PKs of items that should be expanded in the menu.
-    Includes the active item and all its direct ancestors.
+    Builds the context for the menu template from the precomputed tree:
+    one MenuCache lookup, then URLs are resolved against the current URLconf
+    and script prefix, and the active item and its ancestors are looked up by ID.
     """
-    expanded_pks: Set[int] = set()
-    if active_item:
-        expanded_pks.add(active_item.pk)  # Active item's children should be visible
-
-        # Traverse up the parent chain to expand all ancestors
-        current_ancestor: Optional[MenuItemProcessed] = active_item
-        while (
-            current_ancestor
-            and current_ancestor.parent_id
-            and current_ancestor.parent_id in items_by_id
-        ):
-            # Check current_ancestor itself before accessing parent_id
-            parent = items_by_id[current_ancestor.parent_id]
-            expanded_pks.add(parent.pk)
-            current_ancestor = parent  # Move to the next ancestor
-
-    return expanded_pks
+    # Step 1: Load the denormalized tree (rebuilt whenever a MenuItem changes)
+    tree = get_menu_tree(menu_name)
 
+    # Step 2: Resolve URLs, then find the active item and which items' children
+    # should be displayed (expanded)
+    url_index, parent_ids = resolve_menu_tree(tree)
+    active_pk: Optional[int] = url_index.get(current_path)
 
-# --- Main Template Tag ---
+    return {
+        "menu_nodes": tree["nodes"],
+        "menu_name": menu_name,
+        "active_item_pk": active_pk,
+        "expanded_pks": _determine_expanded_pks(active_pk, parent_ids),
+    }
 
 
-@register.inclusion_tag("treemenu/menu_template.html", takes_context=True)
-def draw_menu(context: Dict[str, Any], menu_name: str) -> Dict[str, Any]:
+@register.simple_tag(takes_context=True)
+def draw_menu(context: Dict[str, Any], menu_name: str) -> str:
     """
     Renders a menu specified by 'menu_name'.
-    Handles fetching, processing, tree building, and determining expanded state.
-    The single database query occurs when `_process_menu_items` iterates the QuerySet.
+    The rendered HTML is cached per (menu_name, path) in Django's cache and
+    invalidated whenever a MenuItem is saved or deleted, so a cache hit skips
+    the database query and template rendering altogether.
     """
     request: Optional[HttpRequest] = context.get("request")
 
-    # Default context values for the template tag
-    tag_context: Dict[str, Any] = {
-        "menu_nodes": [],
-        "menu_name": menu_name,
-        "active_item_pk": None,
-        "expanded_pks": set(),
-        "request": request,
-    }
-
     if not request:
         # Consider logging this as it's crucial for active item highlighting.
         # logger.warning(f"Template tag 'draw_menu' for '{menu_name}': HttpRequest not found in context.")
-        return tag_context
+        return ""
 
     current_path: str = request.path
 
-    # Step 1: Fetch menu items (QuerySet is lazy, DB hit in Step 2)
-    menu_items_qs: QuerySet[MenuItem] = _get_menu_items_from_db(menu_name)
-
-    # Step 2: Process items - resolve URLs, find active, index by ID. DB query executes here.
-    all_items_processed, active_item, items_by_id = _process_menu_items(
-        menu_items_qs, current_path
-    )
-
-    if not all_items_processed:  # No items found for this menu_name
-        return tag_context
-
-    # Step 3: Build the hierarchical tree structure
-    root_items: List[MenuItemProcessed] = _build_menu_tree(
-        all_items_processed, items_by_id
-    )
-
-    # Step 4: Determine which items' children should be displayed (expanded)
-    expanded_pks: Set[int] = _determine_expanded_pks(active_item, items_by_id)
-
-    # Update the context for the inclusion template
-    tag_context.update(
-        {
-            "menu_nodes": root_items,
-            "active_item_pk": active_item.pk if active_item else None,
-            "expanded_pks": expanded_pks,
-        }
+    # Repeat invocations for the same menu within one request (header, footer,
+    # sidebar...) reuse the already rendered HTML without touching the cache backend.
+    request_cache: Dict[Tuple[str, str], str] = (
+        getattr(request, "_treemenu_cache", None) or {}
     )
-    return tag_context
+    request_cache_key: Tuple[str, str] = (menu_name, current_path)
+    if request_cache_key in request_cache:
+        return request_cache[request_cache_key]
+
+    cache_key: str = get_menu_cache_key(menu_name, current_path)
+    html: Optional[str] = cache.get(cache_key)
+    if html is None:
+        html = render_to_string(
+            MENU_TEMPLATE, _build_menu_context(menu_name, current_path)
+        )
+        cache.set(cache_key, html, get_menu_cache_timeout())
+
+    html = mark_safe(html)  # Produced by our own autoescaped template
+    request_cache[request_cache_key] = html
+    request._treemenu_cache = request_cache
+    return html
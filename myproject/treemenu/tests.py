@@ -1,3 +1,326 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import path, reverse, set_script_prefix
+from django.views.generic import TemplateView
+
+from .models import MenuCache, MenuItem, resolve_named_url
+from .tree import _build_tree, rebuild_menu_cache
+
+
+class MenuItemCycleValidationTests(TestCase):
+    """Covers the recursive-CTE ancestor check in MenuItem.clean()."""
+
+    def setUp(self) -> None:
+        self.root = MenuItem.objects.create(name="Root", menu_name="main_menu")
+        self.child = MenuItem.objects.create(
+            name="Child", menu_name="main_menu", parent=self.root
+        )
+        self.grandchild = MenuItem.objects.create(
+            name="Grandchild", menu_name="main_menu", parent=self.child
+        )
+
+    def test_item_cannot_be_its_own_parent(self) -> None:
+        self.root.parent_id = self.root.pk
+        with self.assertRaises(ValidationError) as cm:
+            self.root.clean()
+        self.assertIn("parent", cm.exception.message_dict)
+
+    def test_cycle_through_grandchild_is_rejected(self) -> None:
+        self.root.parent = self.grandchild
+        with self.assertRaises(ValidationError) as cm:
+            self.root.clean()
+        self.assertIn("parent", cm.exception.message_dict)
+
+    def test_cycle_check_uses_a_single_query(self) -> None:
+        self.root.parent = self.grandchild
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError):
+                self.root.clean()
+
+    def test_valid_reparenting_passes(self) -> None:
+        self.grandchild.parent = self.root
+        self.grandchild.clean()
+
+    def test_new_item_with_parent_passes(self) -> None:
+        item = MenuItem(name="New", menu_name="main_menu", parent=self.grandchild)
+        self.assertIsNone(item.pk)
+        item.clean()
+
+    def test_existing_loop_is_logged_and_terminates(self) -> None:
+        # Corrupt the data behind the model's back: root <-> child
+        MenuItem.objects.filter(pk=self.root.pk).update(parent=self.child)
+        item = MenuItem(name="New", menu_name="main_menu", parent=self.root)
+        with self.assertLogs("treemenu.models", level="ERROR"):
+            item.clean()
+
+
+class MenuNameNotBlankTests(TestCase):
+    """Covers the menu_name check in clean() and the matching DB constraint."""
+
+    def test_whitespace_menu_name_is_rejected_on_save(self) -> None:
+        for menu_name in (" ", "\t", "\n", " \r\n ", "\xa0", "\u2003"):
+            with self.subTest(menu_name=menu_name):
+                with self.assertRaises(ValidationError):
+                    MenuItem.objects.create(name="Item", menu_name=menu_name)
+
+    def test_full_clean_attaches_error_to_menu_name(self) -> None:
+        item = MenuItem(name="Item", menu_name="\t")
+        with self.assertRaises(ValidationError) as cm:
+            item.full_clean()
+        self.assertEqual(list(cm.exception.message_dict), ["menu_name"])
+
+    def test_database_rejects_whitespace_menu_name(self) -> None:
+        item = MenuItem.objects.create(name="Item", menu_name="main_menu")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            MenuItem.objects.filter(pk=item.pk).update(menu_name="\t\n")
+
+
+class ResolveNamedUrlTests(SimpleTestCase):
+    """Covers the process-wide named URL cache and the script prefix."""
+
+    def tearDown(self) -> None:
+        set_script_prefix("/")
+
+    def test_cached_paths_follow_current_script_prefix(self) -> None:
+        # First use outside any prefix, e.g. from a management command
+        self.assertEqual(resolve_named_url("treemenu_about"), "/about/")
+        set_script_prefix("/site/")
+        self.assertEqual(resolve_named_url("treemenu_about"), "/site/about/")
+
+    def test_first_use_under_prefix_is_not_baked_in(self) -> None:
+        set_script_prefix("/site/")
+        self.assertEqual(resolve_named_url("treemenu_contact"), "/site/contact/")
+        set_script_prefix("/")
+        self.assertEqual(resolve_named_url("treemenu_contact"), "/contact/")
+
+    def test_unknown_name_resolves_to_none(self) -> None:
+        with self.assertLogs("treemenu.models", level="WARNING"):
+            self.assertIsNone(resolve_named_url("treemenu_missing"))
+
+
+def _render_menu(menu_name: str, path: str) -> str:
+    request = RequestFactory().get(path)
+    template = Template(f"{{% load menu_tags %}}{{% draw_menu '{menu_name}' %}}")
+    return template.render(Context({"request": request}))
+
+
+# URLconf for MenuCacheTests: the services page moves from /services/ to /svc/
+urlpatterns = [
+    path("svc/", TemplateView.as_view(), name="treemenu_services"),
+]
+
+
+class MenuCacheTests(TestCase):
+    """Covers the stored MenuCache trees and their deferred rebuilds."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.root = MenuItem.objects.create(
+                name="Services", menu_name="main_menu", named_url="treemenu_services"
+            )
+            self.children = [
+                MenuItem.objects.create(
+                    name=f"Child {i}", menu_name="main_menu", parent=self.root, order=i
+                )
+                for i in range(3)
+            ]
+
+    def test_tree_is_stored_after_commit(self) -> None:
+        tree = MenuCache.objects.get(menu_name="main_menu").tree
+        self.assertEqual([node["name"] for node in tree["nodes"]], ["Services"])
+        self.assertEqual(
+            [node["name"] for node in tree["nodes"][0]["children_nodes"]],
+            ["Child 0", "Child 1", "Child 2"],
+        )
+
+    def test_urls_are_resolved_at_render_time(self) -> None:
+        self.assertIn('href="/services/"', _render_menu("main_menu", "/"))
+        with override_settings(ROOT_URLCONF="treemenu.tests"):
+            cache.clear()
+            html = _render_menu("main_menu", "/svc/")
+        self.assertIn('href="/svc/"', html)
+        self.assertIn("active", html)
+
+    def test_one_rebuild_per_transaction(self) -> None:
+        with mock.patch(
+            "treemenu.tree.rebuild_menu_cache", wraps=rebuild_menu_cache
+        ) as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.root.delete()  # Cascades to every child
+        rebuild.assert_called_once_with("main_menu")
+        self.assertFalse(MenuCache.objects.filter(menu_name="main_menu").exists())
+
+    def test_render_with_stored_tree_costs_one_query(self) -> None:
+        with self.assertNumQueries(1):
+            _render_menu("main_menu", "/")
+
+    def test_render_without_stored_tree_is_read_only(self) -> None:
+        MenuCache.objects.all().delete()
+        for menu_name in ("main_menu", "sidebar_menu"):  # Populated and empty
+            for _ in range(2):
+                cache.clear()
+                with self.subTest(menu_name=menu_name):
+                    with self.assertNumQueries(2):
+                        _render_menu(menu_name, "/")
+        self.assertFalse(MenuCache.objects.exists())
+
+    def test_management_command_picks_up_signal_free_edits(self) -> None:
+        MenuItem.objects.filter(pk=self.root.pk).update(name="Renamed")
+        self.assertNotIn("Renamed", _render_menu("main_menu", "/"))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("rebuild_menu_cache", stdout=StringIO())
+        self.assertIn("Renamed", _render_menu("main_menu", "/"))
+
+
+class BulkImportTests(TestCase):
+    """Covers MenuItem.bulk_import and its post-import cycle check."""
+
+    def test_import_creates_items(self) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.bulk_import(
+                [
+                    {"id": 10, "name": "Root", "menu_name": "main_menu"},
+                    {
+                        "id": 11,
+                        "name": "Child",
+                        "menu_name": "main_menu",
+                        "parent_id": 10,
+                    },
+                    {"id": 12, "name": "Side", "menu_name": "sidebar_menu"},
+                ]
+            )
+        self.assertEqual(MenuItem.objects.count(), 3)
+        self.assertEqual(MenuItem.objects.get(pk=11).parent_id, 10)
+
+    def test_import_with_cycle_rolls_back(self) -> None:
+        with self.assertRaises(ValidationError) as cm:
+            MenuItem.bulk_import(
+                [
+                    {"id": 20, "name": "A", "menu_name": "main_menu", "parent_id": 22},
+                    {"id": 21, "name": "B", "menu_name": "main_menu", "parent_id": 20},
+                    {"id": 22, "name": "C", "menu_name": "main_menu", "parent_id": 21},
+                ]
+            )
+        self.assertIn("parent", cm.exception.message_dict)
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_import_refreshes_menu_cache(self) -> None:
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(name="Existing", menu_name="main_menu")
+        self.assertNotIn("Imported", _render_menu("main_menu", "/"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.bulk_import([{"name": "Imported", "menu_name": "main_menu"}])
+
+        tree = MenuCache.objects.get(menu_name="main_menu").tree
+        self.assertEqual(
+            sorted(node["name"] for node in tree["nodes"]), ["Existing", "Imported"]
+        )
+        self.assertIn("Imported", _render_menu("main_menu", "/"))
+
+
+class MenuHtmlCacheTests(TestCase):
+    """Covers expiry of the cached menu HTML and the per-request cache."""
+
+    def setUp(self) -> None:
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item = MenuItem.objects.create(
+                name="About", menu_name="main_menu", url="/about/"
+            )
+
+    def test_save_expires_cached_html(self) -> None:
+        self.assertIn("About", _render_menu("main_menu", "/"))
+        self.item.name = "About us"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.save()
+        self.assertIn("About us", _render_menu("main_menu", "/"))
+
+    def test_delete_expires_cached_html(self) -> None:
+        self.assertIn("About", _render_menu("main_menu", "/"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.delete()
+        self.assertNotIn("About", _render_menu("main_menu", "/"))
+
+    def test_repeated_draw_menu_in_one_request_is_free(self) -> None:
+        request = RequestFactory().get("/")
+        template = Template("{% load menu_tags %}{% draw_menu 'main_menu' %}")
+        html = template.render(Context({"request": request}))
+        cache.clear()  # Only the request-level cache can answer now
+        with self.assertNumQueries(0):
+            self.assertEqual(template.render(Context({"request": request})), html)
+
+    @override_settings(TREEMENU_CACHE_TIMEOUT=None)
+    def test_cache_timeout_is_read_from_settings(self) -> None:
+        with mock.patch("treemenu.templatetags.menu_tags.cache") as menu_cache:
+            menu_cache.get.return_value = None
+            _render_menu("main_menu", "/")
+        self.assertIsNone(menu_cache.set.call_args.args[2])
+
+
+class MenuItemAdminQueryTests(TestCase):
+    """Guards the changelist against per-row queries for the parent column."""
+
+    def setUp(self) -> None:
+        user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        self.url = reverse("admin:treemenu_menuitem_changelist")
+
+    def _create_items(self, count: int) -> None:
+        root = MenuItem.objects.create(name="Root", menu_name="main_menu")
+        MenuItem.bulk_import(
+            {"name": f"Item {i}", "menu_name": "main_menu", "parent_id": root.pk}
+            for i in range(count - 1)
+        )
+
+    def _assert_changelist_queries(self, num: int) -> None:
+        with self.assertNumQueries(num):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_rows(self) -> None:
+        # Session, user, parent filter choices, two counts, the page rows with
+        # their parents joined, and menu_name filter choices: no per-row queries.
+        self._create_items(5)
+        self._assert_changelist_queries(7)
+        self._create_items(55)  # 60 rows in total
+        self._assert_changelist_queries(7)
+
+
+class BuildTreeTests(SimpleTestCase):
+    """Covers `_build_tree` on rows of (id, parent_id, name, url, named_url)."""
+
+    def test_children_before_their_parent_are_adopted_in_order(self) -> None:
+        rows = [
+            (1, None, "Root", "", ""),
+            (4, 9, "First", "", ""),  # Re-parented under a later-created item
+            (5, 9, "Second", "", ""),
+            (9, 1, "Late parent", "", ""),
+        ]
+        root_items, items_by_id = _build_tree(rows)
+        self.assertEqual([item.id for item in root_items], [1])
+        self.assertEqual([item.id for item in root_items[0].children_nodes], [9])
+        self.assertEqual(
+            [item.name for item in items_by_id[9].children_nodes], ["First", "Second"]
+        )
+
+    def test_items_under_a_parent_outside_the_menu_are_dropped(self) -> None:
+        rows = [
+            (1, None, "Root", "", ""),
+            (6, 42, "Orphan", "", ""),  # Parent 42 belongs to another menu
+            (7, 6, "Orphan child", "", ""),
+        ]
+        root_items, items_by_id = _build_tree(rows)
+        self.assertEqual([item.id for item in root_items], [1])
+        self.assertEqual(root_items[0].children_nodes, [])
+        self.assertEqual([item.id for item in items_by_id[6].children_nodes], [7])
@@ -0,0 +1,255 @@
+import threading
+from typing import (
+    Iterable,
+    List,
+    Dict,
+    Tuple,
+    Set,
+    Optional,
+    Any,
+)  # For comprehensive type hinting
+from django.db import transaction
+from django.db.models import QuerySet
+
+from .cache import invalidate_menu_cache
+from .models import MenuCache, MenuItem, resolve_named_url
+
+
+class MenuNode:
+    """
+    Lightweight carrier for one menu item while the tree is being built.
+    Uses __slots__ so per-item storage has no instance __dict__.
+    """
+
+    __slots__ = ("id", "parent_id", "name", "url", "named_url", "children_nodes")
+
+    def __init__(
+        self, id: int, parent_id: Optional[int], name: str, url: str, named_url: str
+    ) -> None:
+        self.id = id
+        self.parent_id = parent_id
+        self.name = name
+        self.url = url
+        self.named_url = named_url
+        self.children_nodes: List["MenuNode"] = []
+
+
+# Type aliases for clarity
+ItemsByIdMap = Dict[int, MenuNode]
+MenuRow = Tuple[int, Optional[int], str, str, str]
+# Denormalized, JSON-serializable menu as stored in MenuCache.tree:
+#   "version": TREE_FORMAT_VERSION; rows in any other format are rebuilt on read
+#   "nodes":   nested root items, each {"id", "name", "url", "named_url", "children_nodes"}
+#   "items":   [id, parent_id] pairs of every node, in query order
+# URLs are stored unresolved and resolved at render time, so URLconf and
+# script prefix changes never leave stale links in the stored tree.
+MenuTree = Dict[str, Any]
+
+TREE_FORMAT_VERSION = 2
+
+EMPTY_TREE: MenuTree = {"version": TREE_FORMAT_VERSION, "nodes": [], "items": []}
+
+
+def _get_menu_items_from_db(menu_name: str) -> QuerySet:
+    """Fetches and orders all items for a specific menu from DB as plain tuples."""
+    # Only the fields needed for rendering are fetched; `.values_list()` skips
+    # model instantiation entirely. Field order matches the unpacking in `_build_tree`.
+    # Ordering by parent_id, order, name is crucial for efficient tree construction
+    # and predictable display order within levels.
+    return (
+        MenuItem.objects.filter(menu_name=menu_name)
+        .values_list("id", "parent_id", "name", "url", "named_url")
+        .order_by("parent_id", "order", "name")
+    )
+
+
+def _build_tree(rows: Iterable[MenuRow]) -> Tuple[List[MenuNode], ItemsByIdMap]:
+    """
+    Builds the menu tree in a single pass over raw `_get_menu_items_from_db` rows,
+    indexing items by ID and wiring children.
+    Kept free of ORM access so the hot loop only touches tuples, locals and dicts.
+    """
+    root_items: List[MenuNode] = []
+    items_by_id: ItemsByIdMap = {}
+    # Children seen before their parent row, keyed by parent ID. They stay in
+    # query order, so siblings remain sorted once attached.
+    pending: Dict[int, List[MenuNode]] = {}
+
+    # Bound once: attribute lookups in the loop body dominate on very large menus
+    add_root = root_items.append
+    adopt = pending.pop
+    park = pending.setdefault
+    node = MenuNode
+
+    for item_id, parent_id, name, url, named_url in rows:
+        item = node(item_id, parent_id, name, url, named_url)
+
+        # Adopt any children that arrived before this item
+        item.children_nodes = adopt(item_id, item.children_nodes)
+        items_by_id[item_id] = item
+
+        if not parent_id:  # Item without a parent is a root item
+            add_root(item)
+        elif parent_id in items_by_id:
+            # Children are pre-sorted by the initial DB query
+            items_by_id[parent_id].children_nodes.append(item)
+        else:
+            park(parent_id, []).append(item)
+
+    # Anything left in `pending` points at a parent outside this menu and is
+    # dropped, as before.
+    return root_items, items_by_id
+
+
+def _serialize_node(item: MenuNode, visited: Set[int]) -> Dict[str, Any]:
+    """
+    Converts a MenuNode (and its subtree) to the nested dicts the template reads,
+    recording every visited node ID in 'visited'.
+    """
+    visited.add(item.id)
+    return {
+        "id": item.id,
+        "name": item.name,
+        "url": item.url,
+        "named_url": item.named_url,
+        "children_nodes": [
+            _serialize_node(child, visited) for child in item.children_nodes
+        ],
+    }
+
+
+def _load_menu_tree(menu_name: str) -> MenuTree:
+    """
+    Builds the denormalized tree for 'menu_name' from MenuItem rows without
+    writing anything. Executes exactly one database query.
+    """
+    # Stream rows instead of caching the whole result on the QuerySet
+    rows = _get_menu_items_from_db(menu_name).iterator(chunk_size=1000)
+    root_items, items_by_id = _build_tree(rows)
+
+    if not items_by_id:  # No items found for this menu_name
+        return EMPTY_TREE
+
+    visited: Set[int] = set()
+    nodes = [_serialize_node(item, visited) for item in root_items]
+    # `items_by_id` is in query order, so duplicate URLs keep resolving to the
+    # last item in it; items under a parent outside this menu are left out.
+    items = [[pk, item.parent_id] for pk, item in items_by_id.items() if pk in visited]
+
+    return {"version": TREE_FORMAT_VERSION, "nodes": nodes, "items": items}
+
+
+def rebuild_menu_cache(menu_name: str) -> MenuTree:
+    """
+    Rebuilds the denormalized tree for 'menu_name' from MenuItem rows and stores
+    it in MenuCache. Menus without items have their cache row removed.
+    Returns the freshly built tree.
+    """
+    with transaction.atomic():
+        # Lock the cache row before reading items: a concurrent rebuild of the
+        # same menu waits here, then reads the rows committed before it, so an
+        # older tree can never overwrite a newer one.
+        cache_row, _ = MenuCache.objects.select_for_update().get_or_create(
+            menu_name=menu_name, defaults={"tree": EMPTY_TREE}
+        )
+        tree = _load_menu_tree(menu_name)
+        if not tree["items"]:
+            cache_row.delete()
+        else:
+            cache_row.tree = tree
+            cache_row.save(update_fields=["tree"])
+    return tree
+
+
+def get_menu_tree(menu_name: str) -> MenuTree:
+    """
+    Returns the stored tree for 'menu_name'. Costs one primary-key lookup.
+    Menus without a current row (empty menus, data that predates MenuCache or
+    an outdated format) are built from MenuItem rows with one more query but
+    never written here, so rendering stays read-only; rows are written by the
+    signal receivers and the `rebuild_menu_cache` management command.
+    """
+    tree: Optional[MenuTree] = (
+        MenuCache.objects.filter(menu_name=menu_name)
+        .values_list("tree", flat=True)
+        .first()
+    )
+    if tree is None or tree.get("version") != TREE_FORMAT_VERSION:
+        tree = _load_menu_tree(menu_name)
+    return tree
+
+
+def resolve_menu_tree(
+    tree: MenuTree,
+) -> Tuple[Dict[str, int], Dict[int, Optional[int]]]:
+    """
+    Resolves every node's URL in place, prioritizing named_url, then url, then '#'.
+    Returns (resolved URL -> item ID, item ID -> parent ID); duplicate URLs
+    resolve to the last item in query order.
+    """
+    nodes_by_id: Dict[int, Dict[str, Any]] = {}
+    stack = list(tree["nodes"])
+    while stack:
+        node = stack.pop()
+        nodes_by_id[node["id"]] = node
+        stack.extend(node["children_nodes"])
+
+    url_index: Dict[str, int] = {}
+    parent_ids: Dict[int, Optional[int]] = {}
+    resolve = resolve_named_url
+    for item_id, parent_id in tree["items"]:
+        node = nodes_by_id[item_id]
+        named_url = node["named_url"]
+        resolved = resolve(named_url) if named_url else None
+        resolved_url = node["resolved_url"] = resolved or node["url"] or "#"
+        if resolved_url != "#":
+            url_index[resolved_url] = item_id
+        parent_ids[item_id] = parent_id
+    return url_index, parent_ids
+
+
+# --- Deferred rebuilds ---
+
+# Menus touched in the current thread's transaction, awaiting a rebuild on commit
+_pending_rebuilds = threading.local()
+
+
+def _flush_menu_rebuilds() -> None:
+    """Rebuilds each pending menu once, then expires the cached HTML."""
+    menu_names: Set[str] = getattr(_pending_rebuilds, "menu_names", set())
+    if not menu_names:  # Already handled by an earlier callback of this commit
+        return
+    _pending_rebuilds.menu_names = set()
+    for menu_name in menu_names:
+        rebuild_menu_cache(menu_name)
+    invalidate_menu_cache()
+
+
+def schedule_menu_rebuild(menu_names: Iterable[str]) -> None:
+    """
+    Queues 'menu_names' for a rebuild once the current transaction commits
+    (immediately in autocommit mode). However many items a transaction saves
+    or deletes, e.g. a cascade delete or a bulk reorder, each menu is rebuilt
+    and the HTML cache expired only once, after the new rows are visible.
+    """
+    if not hasattr(_pending_rebuilds, "menu_names"):
+        _pending_rebuilds.menu_names = set()
+    _pending_rebuilds.menu_names.update(menu_names)
+    # Registered on every call: callbacks of a rolled-back transaction are
+    # dropped, and surplus callbacks find the set already empty.
+    transaction.on_commit(_flush_menu_rebuilds)
+
+
+def rebuild_all_menu_caches() -> List[str]:
+    """
+    Rebuilds the stored tree of every menu and drops rows for menus that no
+    longer have items. Returns the rebuilt menu names.
+    """
+    menu_names = sorted(
+        set(MenuItem.objects.values_list("menu_name", flat=True).distinct())
+    )
+    MenuCache.objects.exclude(menu_name__in=menu_names).delete()
+    for menu_name in menu_names:
+        rebuild_menu_cache(menu_name)
+    transaction.on_commit(invalidate_menu_cache)
+    return menu_names